@@ -0,0 +1,331 @@
+# admission_service.py
+import functools
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Tuple
+
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from flask import jsonify, request
+
+from deadline_service import current_deadline
+
+# Lower number = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+PRIORITY_NAMES = {
+    "interactive": PRIORITY_INTERACTIVE,
+    "bulk": PRIORITY_BULK,
+}
+
+# Default limits per endpoint: (max_concurrency, max_queue, max_wait_seconds).
+# Override with ADMISSION_<NAME>_CONCURRENCY / _QUEUE / _MAX_WAIT env vars.
+DEFAULT_LIMITS: Dict[str, Tuple[int, int, float]] = {
+    "agent": (4, 16, 30.0),
+    "team_build": (4, 16, 30.0),
+    "team_amend": (4, 16, 30.0),
+    "selenium": (2, 8, 30.0),
+}
+FALLBACK_LIMITS = (4, 16, 30.0)
+
+# Per-client token bucket shared by all admission-controlled endpoints.
+# Clients are keyed by the connecting address; set TRUSTED_PROXY_HOPS when
+# running behind a reverse proxy so X-Forwarded-For is honored (see
+# init_proxy_fix). Callers can never pick their own bucket.
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "30"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "10"))
+MAX_TRACKED_CLIENTS = 10000
+
+# How many recent wait times we keep for percentile stats
+WAIT_SAMPLE_SIZE = 512
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request can't be admitted (queue full or waited too long)."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# ---------------------------------------------------------------------------
+# Per-endpoint concurrency limit with a bounded priority queue
+# ---------------------------------------------------------------------------
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "event", "granted", "cancelled")
+
+    def __init__(self, priority: int, seq: int):
+        self.priority = priority
+        self.seq = seq
+        self.event = threading.Event()
+        self.granted = False
+        self.cancelled = False
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class AdmissionController:
+    """
+    Limit how many requests run an endpoint at once.
+
+    Requests beyond max_concurrency wait in a priority queue (interactive
+    before bulk, FIFO within a priority). If the queue already holds
+    max_queue waiters, or a waiter isn't admitted within max_wait seconds,
+    AdmissionRejected is raised so the caller can fail fast.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._waiters: List[_Waiter] = []
+        self._queued = 0
+        self._active = 0
+
+        self._admitted = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._recent_waits: Deque[float] = deque(maxlen=WAIT_SAMPLE_SIZE)
+        self._service_avg = 1.0
+
+    def _retry_after(self) -> int:
+        # Rough estimate: time for the current backlog to drain
+        backlog = self._queued + self._active
+        return max(1, math.ceil(backlog * self._service_avg / max(1, self.max_concurrency)))
+
+    def _record_wait(self, waited: float) -> None:
+        self._admitted += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+        self._recent_waits.append(waited)
+
+    def acquire(self, priority: int = PRIORITY_INTERACTIVE, timeout: float | None = None) -> float:
+        """
+        Block until admitted; returns seconds spent waiting.
+
+        `timeout` can only shorten max_wait (e.g. to fit a request deadline).
+        """
+        start = time.monotonic()
+        with self._lock:
+            if self._active < self.max_concurrency and self._queued == 0:
+                self._active += 1
+                self._record_wait(0.0)
+                return 0.0
+            if self._queued >= self.max_queue:
+                self._rejected += 1
+                raise AdmissionRejected(f"{self.name}: queue is full", self._retry_after())
+            waiter = _Waiter(priority, next(self._seq))
+            heapq.heappush(self._waiters, waiter)
+            self._queued += 1
+
+        waiter.event.wait(self.max_wait if timeout is None else min(timeout, self.max_wait))
+
+        with self._lock:
+            waited = time.monotonic() - start
+            if waiter.granted:
+                self._record_wait(waited)
+                return waited
+            # Timed out: leave it in the heap, release() skips cancelled waiters
+            waiter.cancelled = True
+            self._queued -= 1
+            self._rejected += 1
+            raise AdmissionRejected(f"{self.name}: timed out waiting for a slot", self._retry_after())
+
+    def release(self, service_seconds: float | None = None) -> None:
+        """Free a slot, handing it straight to the best waiting request."""
+        with self._lock:
+            if service_seconds is not None:
+                self._service_avg = 0.9 * self._service_avg + 0.1 * service_seconds
+            while self._waiters:
+                waiter = heapq.heappop(self._waiters)
+                if waiter.cancelled:
+                    continue
+                waiter.granted = True
+                self._queued -= 1
+                waiter.event.set()
+                return
+            self._active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._recent_waits)
+            active = self._active
+            queued = self._queued
+            admitted = self._admitted
+            rejected = self._rejected
+            wait_total = self._wait_total
+            wait_max = self._wait_max
+
+        def pct(p: float) -> float:
+            if not waits:
+                return 0.0
+            return waits[min(len(waits) - 1, int(p * len(waits)))]
+
+        return {
+            "active": active,
+            "queue_depth": queued,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "admitted": admitted,
+            "rejected": rejected,
+            "wait_seconds": {
+                "avg": wait_total / admitted if admitted else 0.0,
+                "p50": pct(0.50),
+                "p95": pct(0.95),
+                "max": wait_max,
+            },
+        }
+
+
+# ---------------------------------------------------------------------------
+# Per-client token bucket
+# ---------------------------------------------------------------------------
+
+class TokenBucketLimiter:
+    """
+    Token-bucket rate limiter keyed by client id.
+
+    Each client gets `burst` tokens, refilled at `rate_per_minute`.
+    try_acquire() returns (allowed, retry_after_seconds). At most
+    MAX_TRACKED_CLIENTS buckets are kept; the least recently seen client
+    is evicted first.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: float):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self._lock = threading.Lock()
+        # client -> [tokens, last_ts], ordered from least to most recently seen
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def try_acquire(self, client: str) -> Tuple[bool, int]:
+        if self.rate <= 0:
+            return True, 0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                if len(self._buckets) >= MAX_TRACKED_CLIENTS:
+                    self._buckets.popitem(last=False)
+                bucket = self._buckets[client] = [self.burst, now]
+            else:
+                self._buckets.move_to_end(client)
+
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens >= 1.0:
+                bucket[0] = tokens - 1.0
+                return True, 0
+            bucket[0] = tokens
+            return False, max(1, math.ceil((1.0 - tokens) / self.rate))
+
+
+# ---------------------------------------------------------------------------
+# Registry + Flask decorator
+# ---------------------------------------------------------------------------
+
+_controllers: Dict[str, AdmissionController] = {}
+_controllers_lock = threading.Lock()
+rate_limiter = TokenBucketLimiter(RATE_LIMIT_PER_MINUTE, RATE_LIMIT_BURST)
+
+
+def get_controller(name: str) -> AdmissionController:
+    """Return (creating on first use) the controller for an endpoint."""
+    with _controllers_lock:
+        ctrl = _controllers.get(name)
+        if ctrl is None:
+            concurrency, queue, max_wait = DEFAULT_LIMITS.get(name, FALLBACK_LIMITS)
+            prefix = f"ADMISSION_{name.upper()}_"
+            ctrl = AdmissionController(
+                name,
+                max_concurrency=int(os.getenv(prefix + "CONCURRENCY", concurrency)),
+                max_queue=int(os.getenv(prefix + "QUEUE", queue)),
+                max_wait=float(os.getenv(prefix + "MAX_WAIT", max_wait)),
+            )
+            _controllers[name] = ctrl
+        return ctrl
+
+
+def admission_stats() -> Dict[str, Any]:
+    """Queue depth, concurrency and wait-time stats for every endpoint."""
+    with _controllers_lock:
+        controllers = list(_controllers.values())
+    return {ctrl.name: ctrl.stats() for ctrl in controllers}
+
+
+def init_proxy_fix(app: Any) -> None:
+    """
+    Trust X-Forwarded-For from TRUSTED_PROXY_HOPS reverse proxies, so
+    request.remote_addr is the real client. No-op when unset.
+    """
+    if TRUSTED_PROXY_HOPS > 0:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
+
+
+def _client_id() -> str:
+    # Never trust client-supplied ids or raw forwarding headers here
+    return request.remote_addr or "unknown"
+
+
+def _request_priority() -> int:
+    name = (request.headers.get("X-Request-Priority") or "interactive").lower()
+    return PRIORITY_NAMES.get(name, PRIORITY_INTERACTIVE)
+
+
+def _reject(status: int, message: str, retry_after: int) -> Any:
+    response = jsonify({"error": message, "retry_after": retry_after})
+    response.status_code = status
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
+
+def admission_controlled(name: str) -> Callable:
+    """
+    Decorator for expensive Flask views.
+
+    - 429 + Retry-After if the client is over its token-bucket rate.
+    - 503 + Retry-After if the endpoint's queue is full or the wait times out.
+    - Otherwise runs the view once a slot is free. Callers can send
+      "X-Request-Priority: bulk" to yield to interactive requests.
+    """
+
+    def decorator(view: Callable) -> Callable:
+        @functools.wraps(view)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            allowed, retry_after = rate_limiter.try_acquire(_client_id())
+            if not allowed:
+                return _reject(429, "Rate limit exceeded", retry_after)
+
+            ctrl = get_controller(name)
+            deadline = current_deadline()
+            try:
+                ctrl.acquire(
+                    _request_priority(),
+                    timeout=deadline.remaining() if deadline is not None else None,
+                )
+            except AdmissionRejected as e:
+                return _reject(503, f"Server busy: {e}", e.retry_after)
+
+            start = time.monotonic()
+            try:
+                return view(*args, **kwargs)
+            finally:
+                ctrl.release(time.monotonic() - start)
+
+        return wrapper
+
+    return decorator
@@ -1,27 +1,25 @@
 # agents_service.py
 import os
+import re
 import json
-from typing import Any
+import time
+import asyncio
+import threading
+import concurrent.futures
+from typing import Any, Dict
 
-from agents import Agent, Runner  # from openai-agents
+import httpx
+from openai import AsyncOpenAI
+from agents import Agent, ModelSettings, OpenAIResponsesModel, RunConfig, Runner  # from openai-agents
 
+from deadline_service import DeadlineExceeded, current_deadline
 
-def init_agent() -> Agent:
-    """
-    Create the team-building agent for our HelixDB app.
 
-    This agent's job is:
-    - Read a manager prompt + LinkedIn-like profiles for many people.
-    - Decide the best possible team (who is on it, who manages it).
-    - For each selected person, infer tags + a natural-language summary.
-    - Produce a JSON object describing the Helix queries we should run
-      to create Person + Team nodes and connect them.
+# The instructions are module-level constants so every run sends a
+# byte-identical prefix, which lets the provider's prompt caching reuse it.
+# Keep anything request-specific out of them.
 
-    NOTE: The backend (Python) is responsible for actually executing
-    those queries against Helix; the agent just PLANS them.
-    """
-
-    instructions = """
+TEAM_BUILDER_INSTRUCTIONS = """
 You are a team-building assistant for a HelixDB-powered app.
 
 Your job:
@@ -148,16 +146,232 @@ Rules for your output:
   manager prompt even if it uses fewer people.
 """
 
+TEAM_AMENDER_INSTRUCTIONS = """
+You are a team-amendment assistant for a HelixDB-powered app.
+
+You will receive:
+
+- TEAM_NAME: the existing team.
+- CURRENT_ROSTER: a JSON list of the people currently on the team, each with
+  "name", "role" ("manager" or "member"), "tags" and "text".
+- CHANGE_REQUEST: what the manager wants changed about the team.
+- NEW_CANDIDATES_RAW_LINKEDIN (optional): LinkedIn-style profiles for people
+  who are NOT yet in the graph and could be added.
+
+Your job is to decide the SMALLEST set of changes that satisfies the change
+request. Do not redesign the team; leave everyone else as they are.
+
+Allowed actions:
+
+- "add_member": put a person on the team with a role ("manager" or "member").
+  - If the person comes from NEW_CANDIDATES_RAW_LINKEDIN, include a
+    "new_person" object with "tags" and "text" (same style as the roster).
+  - If the person already exists elsewhere in the company, omit "new_person".
+- "remove_member": take a person off the team.
+- "change_role": switch a current team member between "manager" and "member".
+
+OUTPUT FORMAT (very important):
+
+You MUST respond with ONLY a single JSON object, no Markdown, no extra text:
+
+{
+  "team_name": "<string>",
+  "summary": "<one or two sentences explaining the changes>",
+  "changes": [
+    {
+      "action": "add_member",
+      "person_name": "<name>",
+      "role": "manager" | "member",
+      "new_person": {"tags": ["..."], "text": "<summary>"}
+    },
+    {
+      "action": "remove_member",
+      "person_name": "<name>"
+    },
+    {
+      "action": "change_role",
+      "person_name": "<name>",
+      "role": "manager" | "member"
+    }
+  ]
+}
+
+Rules for your output:
+
+- Do NOT include any keys besides "team_name", "summary", "changes".
+- Only use names exactly as they appear in CURRENT_ROSTER or the new candidates.
+- If no change is needed, return an empty "changes" array.
+"""
+
+
+# ---------------------------------------------------------------------------
+# Shared runtime: one event loop, one HTTP client, one model object per tier
+# ---------------------------------------------------------------------------
+
+# Model tiers for the team-build flow. Small candidate pools go to the fast
+# model; pools above TEAM_BUILD_LARGE_TIER_THRESHOLD go to the large one.
+MODEL_TIERS = {
+    "fast": os.getenv("AGENT_FAST_MODEL", "gpt-4.1-mini"),
+    "large": os.getenv("AGENT_LARGE_MODEL", "gpt-4.1"),
+}
+DEFAULT_MODEL_TIER = os.getenv("AGENT_DEFAULT_TIER", "large")
+TEAM_BUILD_LARGE_TIER_THRESHOLD = int(os.getenv("TEAM_BUILD_LARGE_TIER_THRESHOLD", "8"))
+
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+
+_runtime: Dict[str, Any] | None = None
+_runtime_lock = threading.Lock()
+
+_tier_stats: Dict[str, Dict[str, float]] = {}
+_tier_stats_lock = threading.Lock()
+
+
+def init_agent_runtime() -> Dict[str, Any]:
+    """
+    Create (once) the state shared by every agent run.
+
+    Called lazily from run_agent, so importing the app works without
+    OPENAI_API_KEY; the missing key only surfaces as an agent error.
+
+    - A background event loop: the async OpenAI client and its connection
+      pool stay bound to one loop instead of a fresh loop per request.
+    - One AsyncOpenAI client with a keep-alive httpx pool.
+    - One prebuilt model object per tier in MODEL_TIERS.
+    """
+    global _runtime
+    with _runtime_lock:
+        if _runtime is not None:
+            return _runtime
+
+        # Build the client first: it raises if credentials are missing, and we
+        # don't want to leave a loop thread behind on every failed attempt.
+        client = AsyncOpenAI(
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+                ),
+                timeout=httpx.Timeout(120.0, connect=10.0),
+            ),
+        )
+        models = {
+            tier: OpenAIResponsesModel(model=name, openai_client=client)
+            for tier, name in MODEL_TIERS.items()
+        }
+
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, name="agent-loop", daemon=True).start()
+
+        _runtime = {"loop": loop, "client": client, "models": models}
+        return _runtime
+
+
+def estimate_candidate_count(linkedin_raw: str) -> int:
+    """
+    Rough number of candidates in a raw LinkedIn paste.
+
+    Counts "CANDIDATE"/"Name:" markers, falling back to blank-line
+    separated blocks.
+    """
+    candidates = len(re.findall(r"^\s*CANDIDATE\b", linkedin_raw, re.IGNORECASE | re.MULTILINE))
+    if candidates:
+        return candidates
+    names = len(re.findall(r"^\s*Name:", linkedin_raw, re.IGNORECASE | re.MULTILINE))
+    if names:
+        return names
+    return len([b for b in re.split(r"\n\s*\n", linkedin_raw) if b.strip()])
+
+
+def choose_team_build_tier(candidate_count: int) -> str:
+    """Fast model for small candidate pools, large model above the threshold."""
+    return "large" if candidate_count > TEAM_BUILD_LARGE_TIER_THRESHOLD else "fast"
+
+
+def _record_run(tier: str, latency: float, result: Any, error: bool = False) -> None:
+    input_tokens = output_tokens = cached_tokens = 0
+    usage = getattr(getattr(result, "context_wrapper", None), "usage", None)
+    if usage is not None:
+        input_tokens = getattr(usage, "input_tokens", 0) or 0
+        output_tokens = getattr(usage, "output_tokens", 0) or 0
+        details = getattr(usage, "input_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", 0) or 0
+
+    with _tier_stats_lock:
+        stats = _tier_stats.setdefault(
+            tier,
+            {
+                "runs": 0,
+                "errors": 0,
+                "latency_total": 0.0,
+                "latency_max": 0.0,
+                "input_tokens": 0,
+                "cached_input_tokens": 0,
+                "output_tokens": 0,
+            },
+        )
+        stats["runs"] += 1
+        stats["errors"] += int(error)
+        stats["latency_total"] += latency
+        stats["latency_max"] = max(stats["latency_max"], latency)
+        stats["input_tokens"] += input_tokens
+        stats["cached_input_tokens"] += cached_tokens
+        stats["output_tokens"] += output_tokens
+
+
+def agent_stats() -> Dict[str, Any]:
+    """Per-tier run counts, latency and token usage since startup."""
+    with _tier_stats_lock:
+        out = {}
+        for tier, stats in _tier_stats.items():
+            runs = stats["runs"]
+            out[tier] = {
+                "model": MODEL_TIERS.get(tier),
+                **stats,
+                "latency_avg": stats["latency_total"] / runs if runs else 0.0,
+            }
+        return out
+
+
+def init_agent() -> Agent:
+    """
+    Create the team-building agent for our HelixDB app.
+
+    This agent's job is:
+    - Read a manager prompt + LinkedIn-like profiles for many people.
+    - Decide the best possible team (who is on it, who manages it).
+    - For each selected person, infer tags + a natural-language summary.
+    - Produce a JSON object describing the Helix queries we should run
+      to create Person + Team nodes and connect them.
+
+    NOTE: The backend (Python) is responsible for actually executing
+    those queries against Helix; the agent just PLANS them.
+    """
     agent = Agent(
         name="HelixTeamBuilder",
-        instructions=instructions,
-        # (Optional) you can specify a particular model here, e.g.:
-        # model="gpt-4.1-mini"
+        instructions=TEAM_BUILDER_INSTRUCTIONS,
+        # The model is picked per run from MODEL_TIERS (see run_agent)
+    )
+    return agent
+
+
+def init_amend_agent() -> Agent:
+    """
+    Create the agent used to amend an EXISTING team.
+
+    Unlike the team builder, this agent never sees the full candidate pool
+    again. It gets the current roster summary, the requested change and
+    (optionally) a few new candidates, and returns only a delta: who to
+    add, who to remove and whose role changes. The backend turns that
+    delta into edge writes (see helix_service.team_delta_to_queries).
+    """
+    agent = Agent(
+        name="HelixTeamAmender",
+        instructions=TEAM_AMENDER_INSTRUCTIONS,
     )
     return agent
 
 
-def run_agent(agent: Agent, message: str) -> str:
+def run_agent(agent: Agent, message: str, tier: str | None = None) -> str:
     """
     Run a single-turn interaction with the agent synchronously.
 
@@ -172,8 +386,49 @@ def run_agent(agent: Agent, message: str) -> str:
     1. json.loads(result_string)
     2. Iterate over result["queries"]
     3. Call the corresponding Helix queries (createTeam, createPerson, etc.)
+
+    `tier` picks the model ("fast" or "large", see MODEL_TIERS); the default
+    is DEFAULT_MODEL_TIER. Runs go through a shared event loop and HTTP
+    client so connections are reused across requests.
+
+    If the current request has a deadline, the remaining budget is used as
+    the model HTTP timeout and as a hard cap on the whole run.
     """
-    result = Runner.run_sync(agent, message)
+    tier = tier or DEFAULT_MODEL_TIER
+    runtime = init_agent_runtime()
+
+    extra_args: Dict[str, Any] = {}
+    budget = None
+    deadline = current_deadline()
+    if deadline is not None:
+        deadline.check()
+        budget = deadline.remaining()
+        extra_args["timeout"] = budget
+
+    run_config = RunConfig(
+        model=runtime["models"][tier],
+        model_settings=ModelSettings(
+            # Route runs of the same agent to the same prompt-cache shard
+            extra_body={"prompt_cache_key": agent.name},
+            extra_args=extra_args or None,
+        ),
+    )
+
+    start = time.monotonic()
+    future = asyncio.run_coroutine_threadsafe(
+        Runner.run(agent, message, run_config=run_config), runtime["loop"]
+    )
+    try:
+        result = future.result(timeout=budget)
+    except concurrent.futures.TimeoutError as e:
+        future.cancel()
+        _record_run(tier, time.monotonic() - start, None, error=True)
+        raise DeadlineExceeded("agent run exceeded the request deadline") from e
+    except Exception:
+        _record_run(tier, time.monotonic() - start, None, error=True)
+        raise
+
+    _record_run(tier, time.monotonic() - start, result)
     return str(result.final_output)
 
 
@@ -3,23 +3,49 @@ import os
 import json
 from typing import Any, Dict
 
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, jsonify, request, stream_with_context
 
 from helix_service import (
     helix_add_user,
     init_helix_client,
     apply_team_plan_to_helix,
+    get_person_team_counts,
+    get_team_overlap,
+    get_team_roster,
+    get_team_size_distribution,
+    get_teammates_of_person,
+    team_delta_to_queries,
+)
+from admission_service import admission_controlled, admission_stats, init_proxy_fix
+from deadline_service import with_deadline
+from http_service import init_http, send_versioned_html
+from import_service import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_CONCURRENCY,
+    detect_format,
+    import_binary_stream,
 )
 from selenium_service import get_page_title
-from agents_service import init_agent, run_agent
+from agents_service import (
+    MODEL_TIERS,
+    agent_stats,
+    choose_team_build_tier,
+    estimate_candidate_count,
+    init_agent,
+    init_amend_agent,
+    run_agent,
+)
 
 # --- Flask setup ---
 
 app = Flask(__name__, static_folder="static", static_url_path="/static")
+init_http(app)
+init_proxy_fix(app)
 
 # Initialize backends at startup
 helix_client = init_helix_client()
 agent = init_agent()
+amend_agent = init_amend_agent()
 
 
 # --- Frontend routes ---
@@ -27,8 +53,8 @@ agent = init_agent()
 
 @app.route("/")
 def index() -> Any:
-    # Serve the main HTML page
-    return send_from_directory(app.static_folder, "index.html")
+    # Serve the main HTML page, with hashed ?v= URLs for its assets
+    return send_versioned_html(app, "index.html")
 
 
 # --- Health check ---
@@ -44,6 +70,15 @@ def health() -> Any:
     )
 
 
+@app.route("/api/admission", methods=["GET"])
+def api_admission_stats() -> Any:
+    """
+    Per-endpoint admission stats: active requests, queue depth, admitted /
+    rejected counts and wait-time percentiles.
+    """
+    return jsonify(admission_stats())
+
+
 # --- HelixDB demo endpoint (legacy example) ---
 
 
@@ -74,10 +109,109 @@ def api_helix_add_user() -> Any:
     return jsonify({"result": result})
 
 
+# --- Bulk import endpoint ---
+
+
+@app.route("/api/helix/import", methods=["POST"])
+def api_helix_import() -> Any:
+    """
+    Bulk-load people, teams and memberships straight into Helix (no agent).
+
+    The request body is NDJSON (default) or CSV (Content-Type: text/csv or
+    ?format=csv), one row per line; see import_service.validate_row for
+    the accepted row shapes. The body is parsed as a stream, never buffered.
+
+    Query params:
+      format       "ndjson" | "csv" (optional, otherwise from Content-Type)
+      batch_size   rows per Helix write (default 500)
+      concurrency  max parallel batch writes (default 4)
+
+    The response is NDJSON: progress events, per-row errors, rows skipped
+    because the person/team name already exists, and a final
+    {"event": "done", ...} summary.
+    """
+    fmt = request.args.get("format") or detect_format(request.content_type)
+    if fmt not in ("ndjson", "csv"):
+        return jsonify({"error": "format must be 'ndjson' or 'csv'"}), 400
+
+    try:
+        batch_size = int(request.args.get("batch_size", DEFAULT_BATCH_SIZE))
+        concurrency = int(request.args.get("concurrency", DEFAULT_CONCURRENCY))
+    except ValueError:
+        return jsonify({"error": "batch_size and concurrency must be integers"}), 400
+
+    events = import_binary_stream(
+        request.stream, fmt=fmt, batch_size=batch_size, concurrency=concurrency
+    )
+
+    def generate():
+        for event in events:
+            yield json.dumps(event) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+# --- Graph analytics endpoints (cached, computed inside Helix) ---
+
+
+def _analytics_response(fn, *args: Any) -> Any:
+    try:
+        result = fn(*args)
+    except Exception as e:
+        return jsonify({"error": f"Helix query failed: {e}"}), 500
+    # Server-side caching is invalidated on writes; clients must revalidate
+    # so they never keep showing analytics from before an import or amend
+    response = jsonify({"result": result})
+    response.cache_control.no_cache = True
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+@app.route("/api/analytics/person-team-counts", methods=["GET"])
+def api_person_team_counts() -> Any:
+    """
+    Team count per person. ?min_teams=2 answers "who is on multiple teams".
+    """
+    try:
+        min_teams = int(request.args.get("min_teams", 0))
+    except ValueError:
+        return jsonify({"error": "min_teams must be an integer"}), 400
+    return _analytics_response(get_person_team_counts, min_teams)
+
+
+@app.route("/api/analytics/team-overlap", methods=["GET"])
+def api_team_overlap() -> Any:
+    """
+    Shared-member counts between teams. ?team_name=X limits it to one team.
+    """
+    return _analytics_response(get_team_overlap, request.args.get("team_name") or None)
+
+
+@app.route("/api/analytics/team-sizes", methods=["GET"])
+def api_team_sizes() -> Any:
+    """
+    Team sizes plus a size histogram.
+    """
+    return _analytics_response(get_team_size_distribution)
+
+
+@app.route("/api/analytics/teammates", methods=["GET"])
+def api_teammates() -> Any:
+    """
+    Teammates of ?person_name=X, grouped by team.
+    """
+    person_name = request.args.get("person_name")
+    if not person_name:
+        return jsonify({"error": "person_name is required"}), 400
+    return _analytics_response(get_teammates_of_person, person_name)
+
+
 # --- Selenium endpoints ---
 
 
 @app.route("/api/selenium/title", methods=["POST"])
+@with_deadline()
+@admission_controlled("selenium")
 def api_selenium_title() -> Any:
     """
     Example Selenium endpoint: return the page title for a given URL.
@@ -100,6 +234,8 @@ def api_selenium_title() -> Any:
 
 
 @app.route("/api/agent", methods=["POST"])
+@with_deadline()
+@admission_controlled("agent")
 def api_agent() -> Any:
     """
     Send a raw message string to the OpenAI Agent and return its response.
@@ -119,10 +255,20 @@ def api_agent() -> Any:
     return jsonify({"answer": answer})
 
 
+@app.route("/api/agent/stats", methods=["GET"])
+def api_agent_stats() -> Any:
+    """
+    Per-model-tier agent run counts, latency and token usage.
+    """
+    return jsonify(agent_stats())
+
+
 # --- Team-building endpoint: Agent + HelixDB integration ---
 
 
 @app.route("/api/team/build", methods=["POST"])
+@with_deadline()
+@admission_controlled("team_build")
 def api_team_build() -> Any:
     """
     High-level endpoint:
@@ -131,7 +277,9 @@ def api_team_build() -> Any:
     {
       "team_name": "<desired team name>",
       "manager_prompt": "<natural language description of the team you want>",
-      "linkedin_profiles": "<RAW pasted LinkedIn profile text for many people>"
+      "linkedin_profiles": "<RAW pasted LinkedIn profile text for many people>",
+      "include_args": true,  // optional; false drops echoed args from helix_results
+      "model_tier": "fast" | "large"  // optional; default picks by candidate count
     }
 
     FLOW:
@@ -153,6 +301,10 @@ def api_team_build() -> Any:
         or data.get("profiles_raw")
     )
 
+    include_args = data.get("include_args", True)
+    if not isinstance(include_args, bool):
+        return jsonify({"error": "include_args must be true or false"}), 400
+
     if not team_name or not manager_prompt or not linkedin_raw:
         return jsonify(
             {
@@ -173,9 +325,16 @@ CANDIDATES_RAW_LINKEDIN:
 {linkedin_raw}
 """.strip()
 
+    # Small candidate pools go to the fast model, big ones to the large model
+    model_tier = data.get("model_tier") or choose_team_build_tier(
+        estimate_candidate_count(linkedin_raw)
+    )
+    if model_tier not in MODEL_TIERS:
+        return jsonify({"error": f"model_tier must be one of {sorted(MODEL_TIERS)}"}), 400
+
     # 1) Call the agent to get the plan JSON (as a string)
     try:
-        agent_output = run_agent(agent, message)
+        agent_output = run_agent(agent, message, tier=model_tier)
     except Exception as e:
         return jsonify({"error": f"Agent error: {e}"}), 500
 
@@ -193,7 +352,7 @@ CANDIDATES_RAW_LINKEDIN:
 
     # 3) Apply the plan to HelixDB
     try:
-        helix_results = apply_team_plan_to_helix(plan)
+        helix_results = apply_team_plan_to_helix(plan, include_args=include_args)
     except Exception as e:
         return jsonify(
             {
@@ -206,11 +365,115 @@ CANDIDATES_RAW_LINKEDIN:
     return jsonify(
         {
             "plan": plan,
+            "model_tier": model_tier,
             "helix_results": helix_results,
         }
     )
 
 
+@app.route("/api/team/amend", methods=["POST"])
+@with_deadline()
+@admission_controlled("team_amend")
+def api_team_amend() -> Any:
+    """
+    Incrementally change an existing team instead of rebuilding it.
+
+    INPUT JSON:
+    {
+      "team_name": "<existing team name>",
+      "change_prompt": "<what should change about the team>",
+      "linkedin_profiles": "<OPTIONAL raw LinkedIn text for NEW candidates only>",
+      "include_args": true  // optional; false drops query args and "queries"
+    }
+
+    FLOW:
+    - Load the current roster from Helix (getTeamByName / getTeamManagers / getTeamMembers).
+    - Send the agent only the roster summary, the change and any new candidates.
+    - Agent returns a delta plan: add_member / remove_member / change_role.
+    - Translate the delta into edge writes and apply only those; changes
+      that don't fit the graph (unknown or ambiguous names, no-ops) are
+      returned under "skipped".
+    """
+    data: Dict[str, Any] = request.get_json(force=True, silent=True) or {}
+
+    team_name = data.get("team_name")
+    include_args = data.get("include_args", True)
+    if not isinstance(include_args, bool):
+        return jsonify({"error": "include_args must be true or false"}), 400
+    change_prompt = data.get("change_prompt") or data.get("manager_prompt")
+    linkedin_raw = (
+        data.get("linkedin_profiles")
+        or data.get("linkedin_text")
+        or data.get("profiles_raw")
+        or ""
+    )
+
+    if not team_name or not change_prompt:
+        return jsonify({"error": "team_name and change_prompt are required"}), 400
+
+    # 1) Load the current roster
+    try:
+        roster = get_team_roster(team_name)
+    except Exception as e:
+        return jsonify({"error": f"Failed to load team from HelixDB: {e}"}), 500
+
+    if roster is None:
+        return jsonify({"error": f"Team '{team_name}' not found"}), 404
+
+    message = f"""
+TEAM_NAME:
+{team_name}
+
+CURRENT_ROSTER:
+{json.dumps(roster["people"])}
+
+CHANGE_REQUEST:
+{change_prompt}
+
+NEW_CANDIDATES_RAW_LINKEDIN:
+{linkedin_raw or "(none)"}
+""".strip()
+
+    # 2) Ask the agent for a delta plan
+    try:
+        agent_output = run_agent(amend_agent, message)
+    except Exception as e:
+        return jsonify({"error": f"Agent error: {e}"}), 500
+
+    try:
+        delta = json.loads(agent_output)
+    except Exception as e:
+        return jsonify(
+            {
+                "error": "Agent did not return valid JSON according to the expected schema.",
+                "details": str(e),
+                "raw_output": agent_output,
+            }
+        ), 500
+
+    # 3) Apply only the edge writes the delta needs
+    try:
+        queries, skipped = team_delta_to_queries(delta, roster)
+    except Exception as e:
+        return jsonify({"error": f"Failed to check delta against HelixDB: {e}", "delta": delta}), 500
+
+    try:
+        helix_results = apply_team_plan_to_helix({"queries": queries}, include_args=include_args)
+    except Exception as e:
+        return jsonify(
+            {
+                "error": f"Failed to apply delta to HelixDB: {e}",
+                "delta": delta,
+            }
+        ), 500
+
+    body: Dict[str, Any] = {"delta": delta, "skipped": skipped, "helix_results": helix_results}
+    if include_args:
+        # The queries repeat every createPerson text; leave them out on request
+        body["queries"] = queries
+    return jsonify(body)
+
+
 # --- Entry point ---
 
 
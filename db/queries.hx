@@ -29,6 +29,30 @@ QUERY addTeamManager (person_id: ID, team_id: ID) =>
     edge <- AddE<Person_manager_of_Team>()::From(person)::To(team)
     RETURN edge
 
+// Name-based edge helpers (used by bulk import, where node IDs are unknown)
+QUERY addTeamMemberByName (person_name: String, team_name: String) =>
+    person <- N<Person>::WHERE(_::{name}::EQ(person_name))
+    team <- N<Team>::WHERE(_::{name}::EQ(team_name))
+    edge <- AddE<Person_member_of_Team>()::From(person)::To(team)
+    RETURN edge
+
+QUERY addTeamManagerByName (person_name: String, team_name: String) =>
+    person <- N<Person>::WHERE(_::{name}::EQ(person_name))
+    team <- N<Team>::WHERE(_::{name}::EQ(team_name))
+    edge <- AddE<Person_manager_of_Team>()::From(person)::To(team)
+    RETURN edge
+
+// Name-based edge removal (used by incremental team amendments)
+QUERY removeTeamMemberByName (person_name: String, team_name: String) =>
+    team <- N<Team>::WHERE(_::{name}::EQ(team_name))
+    DROP team::InE<Person_member_of_Team>::WHERE(_::FromN::{name}::EQ(person_name))
+    RETURN "removed"
+
+QUERY removeTeamManagerByName (person_name: String, team_name: String) =>
+    team <- N<Team>::WHERE(_::{name}::EQ(team_name))
+    DROP team::InE<Person_manager_of_Team>::WHERE(_::FromN::{name}::EQ(person_name))
+    RETURN "removed"
+
 // Get all members for a given team
 QUERY getTeamMembers (team_id: ID) =>
     team <- N<Team>(team_id)
@@ -58,3 +82,76 @@ QUERY getAllPeople () =>
 QUERY getAllTeams () =>
     teams <- N<Team>
     RETURN teams
+
+// ---------------------------------------------------------------------------
+// Analytics (computed as traversals inside Helix, one round trip each)
+// ---------------------------------------------------------------------------
+
+// The teams each person is on, split by edge type. Someone can be both
+// member and manager of one team, so callers count the distinct names.
+QUERY getPersonTeamCounts () =>
+    people <- N<Person>
+    RETURN people::{
+        name,
+        member_teams: _::Out<Person_member_of_Team>::{name},
+        managed_teams: _::Out<Person_manager_of_Team>::{name}
+    }
+
+// Candidates for people on more than one team, with the teams they are on.
+// Member+manager of a single team also matches the AND branch; callers
+// drop those by counting distinct team names.
+QUERY getMultiTeamPeople () =>
+    people <- N<Person>::WHERE(
+        OR(
+            _::Out<Person_member_of_Team>::COUNT::GT(1),
+            _::Out<Person_manager_of_Team>::COUNT::GT(1),
+            AND(
+                _::Out<Person_member_of_Team>::COUNT::GT(0),
+                _::Out<Person_manager_of_Team>::COUNT::GT(0)
+            )
+        )
+    )
+    RETURN people::{
+        name,
+        member_teams: _::Out<Person_member_of_Team>::{name},
+        managed_teams: _::Out<Person_manager_of_Team>::{name}
+    }
+
+// Members and managers of one team, and every team each of them is on
+QUERY getTeamPeopleTeams (team_name: String) =>
+    team <- N<Team>::WHERE(_::{name}::EQ(team_name))
+    members <- team::In<Person_member_of_Team>
+    managers <- team::In<Person_manager_of_Team>
+    RETURN members::{
+        name,
+        member_teams: _::Out<Person_member_of_Team>::{name},
+        managed_teams: _::Out<Person_manager_of_Team>::{name}
+    }, managers::{
+        name,
+        member_teams: _::Out<Person_member_of_Team>::{name},
+        managed_teams: _::Out<Person_manager_of_Team>::{name}
+    }
+
+// Team size (members + managers) for every team
+QUERY getTeamSizes () =>
+    teams <- N<Team>
+    RETURN teams::{
+        name,
+        member_count: _::In<Person_member_of_Team>::COUNT,
+        manager_count: _::In<Person_manager_of_Team>::COUNT
+    }
+
+// Every team a person is on (as member or manager), with its members and managers
+QUERY getTeammatesOfPerson (person_name: String) =>
+    person <- N<Person>::WHERE(_::{name}::EQ(person_name))
+    member_teams <- person::Out<Person_member_of_Team>
+    managed_teams <- person::Out<Person_manager_of_Team>
+    RETURN member_teams::{
+        name,
+        members: _::In<Person_member_of_Team>::{name},
+        managers: _::In<Person_manager_of_Team>::{name}
+    }, managed_teams::{
+        name,
+        members: _::In<Person_member_of_Team>::{name},
+        managers: _::In<Person_manager_of_Team>::{name}
+    }
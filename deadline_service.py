@@ -0,0 +1,148 @@
+# deadline_service.py
+import contextvars
+import functools
+import os
+import random
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Tuple, Type
+
+from flask import make_response, request
+
+# Default end-to-end budget for a request, overridable per request with
+# the X-Request-Timeout header (seconds), capped at MAX_REQUEST_DEADLINE.
+DEFAULT_REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE_SECONDS", "60"))
+MAX_REQUEST_DEADLINE = float(os.getenv("MAX_REQUEST_DEADLINE_SECONDS", "300"))
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the current request has run out of time budget."""
+
+
+class Deadline:
+    """An absolute point in (monotonic) time by which work must finish."""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def check(self) -> None:
+        if self.expired:
+            raise DeadlineExceeded("request deadline exceeded")
+
+
+_current: contextvars.ContextVar[Deadline | None] = contextvars.ContextVar(
+    "request_deadline", default=None
+)
+
+
+def current_deadline() -> Deadline | None:
+    """Return the deadline of the request being handled, if any."""
+    return _current.get()
+
+
+@contextmanager
+def deadline_scope(seconds: float) -> Iterator[Deadline]:
+    """
+    Set a deadline for the enclosed block.
+
+    A nested scope can only shorten the budget, never extend it.
+    """
+    deadline = Deadline(seconds)
+    outer = _current.get()
+    if outer is not None and outer.expires_at < deadline.expires_at:
+        deadline = outer
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def timeout_for(default: float | None) -> float | None:
+    """
+    Shrink a downstream timeout to fit the remaining budget.
+
+    Returns `default` unchanged when no deadline is set. Raises
+    DeadlineExceeded if the budget is already spent.
+    """
+    deadline = current_deadline()
+    if deadline is None:
+        return default
+    deadline.check()
+    remaining = deadline.remaining()
+    return remaining if default is None else min(default, remaining)
+
+
+def sleep_within_deadline(seconds: float) -> None:
+    """time.sleep, but never past the current deadline."""
+    time.sleep(timeout_for(seconds) or 0.0)
+
+
+def retry_with_backoff(
+    fn: Callable[[], Any],
+    attempts: int = 3,
+    base_delay: float = 0.2,
+    max_delay: float = 2.0,
+    retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+) -> Any:
+    """
+    Call fn(), retrying failures with full-jitter exponential backoff.
+
+    We only retry while the current deadline leaves room for the sleep
+    plus another attempt; otherwise the last error is raised.
+    """
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except DeadlineExceeded:
+            raise
+        except retry_on:
+            if attempt == attempts - 1:
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+            deadline = current_deadline()
+            if deadline is not None and deadline.remaining() <= delay:
+                raise
+            time.sleep(delay)
+
+
+def _requested_seconds(default_seconds: float) -> float:
+    header = request.headers.get("X-Request-Timeout")
+    try:
+        seconds = float(header) if header else default_seconds
+    except ValueError:
+        seconds = default_seconds
+    return max(0.0, min(seconds, MAX_REQUEST_DEADLINE))
+
+
+def with_deadline(default_seconds: float = DEFAULT_REQUEST_DEADLINE) -> Callable:
+    """
+    Decorator for Flask views: run the view under a request deadline.
+
+    Downstream calls (agent run, Helix queries, Selenium waits) read the
+    deadline via current_deadline()/timeout_for(). If the view fails with a
+    5xx after the deadline has passed, the status is reported as 504.
+    """
+
+    def decorator(view: Callable) -> Callable:
+        @functools.wraps(view)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with deadline_scope(_requested_seconds(default_seconds)) as deadline:
+                try:
+                    response = make_response(view(*args, **kwargs))
+                except DeadlineExceeded as e:
+                    response = make_response({"error": str(e)}, 504)
+                if response.status_code >= 500 and deadline.expired:
+                    response.status_code = 504
+                return response
+
+        return wrapper
+
+    return decorator
@@ -1,13 +1,44 @@
 # helix_service.py
+import functools
 import os
-from typing import Any, Dict, List
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Deque, Dict, List, Set, Tuple
 
 import helix
 from helix.client import Query
 from helix.types import Payload
 
+from deadline_service import DeadlineExceeded, retry_with_backoff, timeout_for
+
 _db: helix.Client | None = None
 
+# Queries with these prefixes only read, so they are safe to retry and hedge
+IDEMPOTENT_QUERY_PREFIXES = ("get",)
+
+# Default per-query timeout when the request has no deadline of its own
+HELIX_QUERY_TIMEOUT = float(os.getenv("HELIX_QUERY_TIMEOUT", "10"))
+HELIX_READ_ATTEMPTS = 3
+
+# Hedging: once a read has been slower than its recent p95, fire a second copy
+HEDGE_MIN_SAMPLES = 20
+LATENCY_SAMPLE_SIZE = 200
+
+# helix-py calls block without a timeout, so reads run on worker threads
+# and we stop waiting once the budget runs out. Writes never go through the
+# pool: a write we gave up on could still land after being reported failed.
+HELIX_QUERY_WORKERS = int(os.getenv("HELIX_QUERY_WORKERS", "16"))
+_query_pool = ThreadPoolExecutor(
+    max_workers=HELIX_QUERY_WORKERS,
+    thread_name_prefix="helix-query",
+)
+_pool_busy = 0
+_pool_busy_lock = threading.Lock()
+_latencies: Dict[str, Deque[float]] = {}
+_latencies_lock = threading.Lock()
+
 
 def init_helix_client() -> helix.Client:
     """
@@ -63,6 +94,91 @@ def helix_add_user(name: str, age: int) -> Any:
 # Generic helpers for your team-building flow
 # ---------------------------------------------------------------------------
 
+def _timed_query(query_name: str, args: Dict[str, Any]) -> Any:
+    db = init_helix_client()
+    start = time.monotonic()
+    # helix-py supports db.query("queryName", {"arg": value, ...})
+    res = db.query(query_name, args)
+    with _latencies_lock:
+        samples = _latencies.setdefault(query_name, deque(maxlen=LATENCY_SAMPLE_SIZE))
+        samples.append(time.monotonic() - start)
+    return res
+
+
+def _p95_latency(query_name: str) -> float | None:
+    with _latencies_lock:
+        samples = sorted(_latencies.get(query_name, ()))
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return None
+    return samples[int(0.95 * (len(samples) - 1))]
+
+
+def _pool_done(_: Future) -> None:
+    global _pool_busy
+    with _pool_busy_lock:
+        _pool_busy -= 1
+
+
+def _submit(query_name: str, args: Dict[str, Any]) -> Future:
+    global _pool_busy
+    with _pool_busy_lock:
+        _pool_busy += 1
+    fut = _query_pool.submit(_timed_query, query_name, args)
+    fut.add_done_callback(_pool_done)
+    return fut
+
+
+def _pool_has_capacity() -> bool:
+    with _pool_busy_lock:
+        return _pool_busy < HELIX_QUERY_WORKERS
+
+
+def _wait_for_result(futures: List[Future], timeout: float | None) -> Any:
+    """
+    Return the first successful result among futures, within timeout.
+
+    Whatever is still pending when we return or give up is cancelled, so
+    queued copies never run and don't hold up later queries.
+    """
+    pending = set(futures)
+    error: BaseException | None = None
+    end = None if timeout is None else time.monotonic() + timeout
+    try:
+        while pending:
+            remaining = None if end is None else max(0.0, end - time.monotonic())
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for fut in done:
+                if fut.exception() is None:
+                    return fut.result()
+                error = fut.exception()
+        if error is not None and not pending:
+            raise error
+        raise DeadlineExceeded("Helix query timed out")
+    finally:
+        for fut in pending:
+            fut.cancel()
+
+
+def _run_read(query_name: str, args: Dict[str, Any]) -> Any:
+    timeout = timeout_for(HELIX_QUERY_TIMEOUT)
+    primary = _submit(query_name, args)
+
+    hedge_after = _p95_latency(query_name)
+    if hedge_after is None or (timeout is not None and hedge_after >= timeout):
+        return _wait_for_result([primary], timeout)
+
+    done, _ = wait([primary], timeout=hedge_after)
+    if done:
+        return primary.result()
+    if not _pool_has_capacity():
+        # Hedging into a saturated pool would only queue behind other work
+        return _wait_for_result([primary], timeout - hedge_after)
+    backup = _submit(query_name, args)
+    return _wait_for_result([primary, backup], timeout - hedge_after)
+
+
 def run_helix_query(query_name: str, args: Dict[str, Any]) -> Any:
     """
     Run a Helix query by name, using the simple string + dict API:
@@ -70,13 +186,29 @@ def run_helix_query(query_name: str, args: Dict[str, Any]) -> Any:
         db.query("createPerson", {"name": "...", "tags": [...], "text": "..."})
 
     This assumes the query name exists in your Helix .hx files.
+
+    Read-only queries ("get*") are bounded by the current request deadline
+    (see deadline_service), falling back to HELIX_QUERY_TIMEOUT. They are
+    retried with jittered backoff while budget remains, and hedged with a
+    second copy once they run past their p95.
+
+    Writes are not idempotent, so they are never retried or abandoned
+    mid-flight: they run on the calling thread and are only refused if the
+    deadline has already passed before they start.
     """
-    db = init_helix_client()
-    # helix-py supports db.query("queryName", {"arg": value, ...})
-    return db.query(query_name, args)
+    if not query_name.startswith(IDEMPOTENT_QUERY_PREFIXES):
+        timeout_for(None)  # raises DeadlineExceeded before we write anything
+        return _timed_query(query_name, args)
+
+    return retry_with_backoff(
+        lambda: _run_read(query_name, args),
+        attempts=HELIX_READ_ATTEMPTS,
+    )
 
 
-def apply_team_plan_to_helix(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+def apply_team_plan_to_helix(
+    plan: Dict[str, Any], include_args: bool = True
+) -> List[Dict[str, Any]]:
     """
     Given the JSON plan produced by the agent, apply it to HelixDB.
 
@@ -100,6 +232,9 @@ def apply_team_plan_to_helix(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
     - Iterates plan["queries"] in order
     - Calls run_helix_query(query_name, args) for each
     - Collects and returns the results, tagged with query_name
+
+    Pass include_args=False to leave the echoed query args (which repeat
+    the long person/team summaries) out of the results.
     """
     queries = plan.get("queries", [])
     results: List[Dict[str, Any]] = []
@@ -121,21 +256,380 @@ def apply_team_plan_to_helix(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
 
         try:
             res = run_helix_query(q_name, q_args)
-            results.append(
+            entry = {"query_name": q_name, "result": res}
+        except Exception as e:
+            # Record the error but keep processing the remaining queries
+            entry = {"query_name": q_name, "error": str(e)}
+
+        if include_args:
+            entry["args"] = q_args
+        results.append(entry)
+
+    if queries:
+        clear_analytics_cache()
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Incremental team amendments
+# ---------------------------------------------------------------------------
+
+def unwrap_result(res: Any, key: str) -> List[Dict[str, Any]]:
+    """
+    Pull the list of nodes returned under `key` out of a helix-py response.
+
+    helix-py returns one response per payload item, e.g.
+    [{"team": [{...}]}], so we flatten that to [{...}].
+    """
+    if isinstance(res, list):
+        out: List[Dict[str, Any]] = []
+        for item in res:
+            out.extend(unwrap_result(item, key))
+        return out
+    if isinstance(res, dict):
+        value = res.get(key, [])
+        if isinstance(value, dict):
+            return [value]
+        if isinstance(value, list):
+            return [v for v in value if isinstance(v, dict)]
+    return []
+
+
+def get_team_roster(team_name: str) -> Dict[str, Any] | None:
+    """
+    Load the current roster of a team from Helix.
+
+    Uses getTeamByName + getTeamMembers + getTeamManagers. Returns None if
+    the team does not exist, otherwise:
+
+    {
+      "team": {"id": ..., "name": ..., "text": ...},
+      "people": [
+        {"name": ..., "tags": [...], "text": ..., "role": "manager" | "member"},
+        ...
+      ]
+    }
+    """
+    teams = unwrap_result(run_helix_query("getTeamByName", {"team_name": team_name}), "team")
+    if not teams:
+        return None
+    team = teams[0]
+    team_id = team.get("id")
+
+    managers = unwrap_result(run_helix_query("getTeamManagers", {"team_id": team_id}), "managers")
+    members = unwrap_result(run_helix_query("getTeamMembers", {"team_id": team_id}), "members")
+
+    people: List[Dict[str, Any]] = []
+    for role, nodes in (("manager", managers), ("member", members)):
+        for node in nodes:
+            people.append(
                 {
-                    "query_name": q_name,
-                    "args": q_args,
-                    "result": res,
+                    "name": node.get("name"),
+                    "tags": node.get("tags") or [],
+                    "text": node.get("text") or "",
+                    "role": role,
                 }
             )
-        except Exception as e:
-            # Record the error but keep processing the remaining queries
-            results.append(
+
+    return {
+        "team": {"id": team_id, "name": team.get("name"), "text": team.get("text") or ""},
+        "people": people,
+    }
+
+
+_ADD_EDGE_QUERY = {"member": "addTeamMemberByName", "manager": "addTeamManagerByName"}
+_REMOVE_EDGE_QUERY = {"member": "removeTeamMemberByName", "manager": "removeTeamManagerByName"}
+
+
+def team_delta_to_queries(
+    delta: Dict[str, Any], roster: Dict[str, Any]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Translate an agent delta plan into the minimal list of Helix queries.
+
+    Expected delta shape (from agents_service.py amend instructions):
+
+    {
+      "team_name": "...",
+      "changes": [
+        {"action": "add_member", "person_name": "...", "role": "member" | "manager",
+         "new_person": {"tags": [...], "text": "..."}},     // new_person only for new candidates
+        {"action": "remove_member", "person_name": "..."},
+        {"action": "change_role", "person_name": "...", "role": "member" | "manager"}
+      ]
+    }
+
+    Changes are checked against the current roster so no-op writes are
+    skipped (adding someone already on the team, removing someone who
+    isn't, or changing to the role they already have). Before any edge is
+    added, the person's name is looked up with getPersonByName: it must
+    match exactly one Person, or none when the change carries new_person
+    (only then is createPerson emitted), since the *ByName edge queries
+    would otherwise do nothing or link every node sharing the name.
+
+    Returns (queries, skipped), where skipped lists each change that was
+    not turned into writes as {"change": ..., "reason": "..."}.
+    """
+    team_name = roster["team"]["name"]
+    # A person can be both manager and member of the same team
+    current: Dict[str, Set[str]] = {}
+    for p in roster.get("people", []):
+        if p.get("name"):
+            current.setdefault(p["name"], set()).add(p["role"])
+    person_counts: Dict[str, int] = {}
+    queries: List[Dict[str, Any]] = []
+    skipped: List[Dict[str, Any]] = []
+
+    def edge(query_name: str, person_name: str) -> Dict[str, Any]:
+        return {
+            "query_name": query_name,
+            "args": {"person_name": person_name, "team_name": team_name},
+        }
+
+    def person_count(person_name: str) -> int:
+        if person_name not in person_counts:
+            res = run_helix_query("getPersonByName", {"person_name": person_name})
+            person_counts[person_name] = len(unwrap_result(res, "person"))
+        return person_counts[person_name]
+
+    def skip(change: Any, reason: str) -> None:
+        skipped.append({"change": change, "reason": reason})
+
+    for change in delta.get("changes", []):
+        if not isinstance(change, dict):
+            skip(change, "change must be a JSON object")
+            continue
+        action = change.get("action")
+        person_name = change.get("person_name")
+        role = str(change.get("role") or "member").lower()
+        if not person_name:
+            skip(change, "missing person_name")
+            continue
+        if action in ("add_member", "change_role") and role not in _ADD_EDGE_QUERY:
+            skip(change, f"unknown role {change.get('role')!r}")
+            continue
+
+        if action == "add_member":
+            if person_name in current:
+                skip(change, "already on the team")
+                continue
+            n = person_count(person_name)
+            new_person = change.get("new_person")
+            if n > 1:
+                skip(change, f"{n} people named {person_name!r}; add is ambiguous")
+                continue
+            if n == 0:
+                if not isinstance(new_person, dict):
+                    skip(change, f"no person named {person_name!r}")
+                    continue
+                queries.append(
+                    {
+                        "query_name": "createPerson",
+                        "args": {
+                            "name": person_name,
+                            "tags": new_person.get("tags") or [],
+                            "text": new_person.get("text") or "",
+                        },
+                    }
+                )
+                person_counts[person_name] = 1
+            queries.append(edge(_ADD_EDGE_QUERY[role], person_name))
+            current[person_name] = {role}
+
+        elif action == "remove_member":
+            old_roles = current.pop(person_name, None)
+            if not old_roles:
+                skip(change, "not on the team")
+                continue
+            for old_role in sorted(old_roles):
+                queries.append(edge(_REMOVE_EDGE_QUERY[old_role], person_name))
+
+        elif action == "change_role":
+            old_roles = current.get(person_name)
+            if not old_roles:
+                skip(change, "not on the team")
+                continue
+            if old_roles == {role}:
+                skip(change, f"already {role}")
+                continue
+            if role not in old_roles:
+                n = person_count(person_name)
+                if n != 1:
+                    skip(change, f"{n} people named {person_name!r}; change is ambiguous")
+                    continue
+            for old_role in sorted(old_roles - {role}):
+                queries.append(edge(_REMOVE_EDGE_QUERY[old_role], person_name))
+            if role not in old_roles:
+                queries.append(edge(_ADD_EDGE_QUERY[role], person_name))
+            current[person_name] = {role}
+
+        else:
+            skip(change, f"unknown action {action!r}")
+
+    return queries, skipped
+
+
+# ---------------------------------------------------------------------------
+# Graph analytics (traversals run inside Helix, results cached briefly)
+# ---------------------------------------------------------------------------
+
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "30"))
+ANALYTICS_CACHE_MAX_ENTRIES = 1024
+
+_analytics_cache: Dict[Any, Any] = {}
+_analytics_cache_lock = threading.Lock()
+# Bumped on every clear, so results computed across a write are not stored
+_analytics_generation = 0
+
+
+def _cached_analytics(fn):
+    """Cache an analytics helper's result per arguments for ANALYTICS_CACHE_TTL seconds."""
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any) -> Any:
+        key = (fn.__name__, args)
+        now = time.monotonic()
+        with _analytics_cache_lock:
+            hit = _analytics_cache.get(key)
+            if hit is not None and hit[0] > now:
+                return hit[1]
+            generation = _analytics_generation
+        value = fn(*args)
+        with _analytics_cache_lock:
+            if generation != _analytics_generation:
+                # The graph changed while we were querying; this may be stale
+                return value
+            if len(_analytics_cache) >= ANALYTICS_CACHE_MAX_ENTRIES:
+                for k in [k for k, (exp, _) in _analytics_cache.items() if exp <= now]:
+                    del _analytics_cache[k]
+            _analytics_cache[key] = (now + ANALYTICS_CACHE_TTL, value)
+        return value
+
+    return wrapper
+
+
+def clear_analytics_cache() -> None:
+    """Drop cached analytics; call after writes that change team membership."""
+    global _analytics_generation
+    with _analytics_cache_lock:
+        _analytics_generation += 1
+        _analytics_cache.clear()
+
+
+def _names(items: Any) -> List[str]:
+    return [i.get("name") for i in items or [] if isinstance(i, dict) and i.get("name")]
+
+
+@_cached_analytics
+def get_person_team_counts(min_teams: int = 0) -> List[Dict[str, Any]]:
+    """
+    Team count per person, largest first.
+
+    team_count is the number of distinct teams the person is on; a member
+    and manager of the same team counts that team once. member_count and
+    manager_count are the per-edge-type counts.
+
+    Only people on at least `min_teams` teams are returned.
+    """
+    rows = unwrap_result(run_helix_query("getPersonTeamCounts", {}), "people")
+    out = []
+    for row in rows:
+        member_teams = _names(row.get("member_teams"))
+        managed_teams = _names(row.get("managed_teams"))
+        total = len(set(member_teams) | set(managed_teams))
+        if total >= min_teams:
+            out.append(
                 {
-                    "query_name": q_name,
-                    "args": q_args,
-                    "error": str(e),
+                    "name": row.get("name"),
+                    "member_count": len(member_teams),
+                    "manager_count": len(managed_teams),
+                    "team_count": total,
                 }
             )
+    out.sort(key=lambda r: (-r["team_count"], r["name"] or ""))
+    return out
 
-    return results
+
+@_cached_analytics
+def get_team_overlap(team_name: str | None = None) -> List[Dict[str, Any]]:
+    """
+    Shared-member counts between teams, largest overlap first.
+
+    With team_name, returns the teams that share people with that team.
+    Without it, returns every team pair that shares at least one person.
+    Both member and manager edges count, matching get_person_team_counts.
+    Either way Helix does the traversal; we only tally the pairs.
+    """
+    if team_name:
+        res = run_helix_query("getTeamPeopleTeams", {"team_name": team_name})
+        people = unwrap_result(res, "members") + unwrap_result(res, "managers")
+    else:
+        people = unwrap_result(run_helix_query("getMultiTeamPeople", {}), "people")
+
+    # A member+manager of the same team appears twice; tally each person once
+    teams_by_person: Dict[str, set] = {}
+    for row in people:
+        teams_by_person.setdefault(row.get("name"), set()).update(
+            _names(row.get("member_teams")) + _names(row.get("managed_teams"))
+        )
+
+    shared: Dict[tuple, List[str]] = {}
+    for name, team_set in teams_by_person.items():
+        teams = sorted(team_set)
+        for i, a in enumerate(teams):
+            for b in teams[i + 1:]:
+                if team_name and team_name not in (a, b):
+                    continue
+                shared.setdefault((a, b), []).append(name)
+
+    out = []
+    for (a, b), people in shared.items():
+        if team_name:
+            other = b if a == team_name else a
+            out.append({"team": other, "shared_count": len(people), "shared_members": people})
+        else:
+            out.append({"teams": [a, b], "shared_count": len(people), "shared_members": people})
+    out.sort(key=lambda r: -r["shared_count"])
+    return out
+
+
+@_cached_analytics
+def get_team_size_distribution() -> Dict[str, Any]:
+    """
+    Team sizes (members + managers) plus a size -> number-of-teams histogram.
+    """
+    rows = unwrap_result(run_helix_query("getTeamSizes", {}), "teams")
+    teams = []
+    histogram: Dict[int, int] = {}
+    for row in rows:
+        size = int(row.get("member_count") or 0) + int(row.get("manager_count") or 0)
+        teams.append({"name": row.get("name"), "size": size})
+        histogram[size] = histogram.get(size, 0) + 1
+
+    teams.sort(key=lambda t: -t["size"])
+    return {
+        "teams": teams,
+        "histogram": [{"size": s, "teams": n} for s, n in sorted(histogram.items())],
+    }
+
+
+@_cached_analytics
+def get_teammates_of_person(person_name: str) -> List[Dict[str, Any]]:
+    """
+    The teams a person is on (as member or manager), with their teammates on each.
+    """
+    res = run_helix_query("getTeammatesOfPerson", {"person_name": person_name})
+    rows: List[Dict[str, Any]] = []
+    seen = set()
+    for row in unwrap_result(res, "member_teams") + unwrap_result(res, "managed_teams"):
+        if row.get("name") not in seen:
+            seen.add(row.get("name"))
+            rows.append(row)
+    return [
+        {
+            "team": row.get("name"),
+            "members": [n for n in _names(row.get("members")) if n != person_name],
+            "managers": [n for n in _names(row.get("managers")) if n != person_name],
+        }
+        for row in rows
+    ]
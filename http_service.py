@@ -0,0 +1,228 @@
+# http_service.py
+import gzip
+import hashlib
+import os
+import re
+import threading
+from typing import Any, Dict, Tuple
+
+from flask import Flask, Response, request
+from werkzeug.security import safe_join
+from flask.json.provider import DefaultJSONProvider
+
+# Optional speedups: we fall back to the stdlib if these aren't installed.
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+
+# Responses smaller than this aren't worth compressing
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Static assets requested with a ?v=<version> query are treated as immutable
+STATIC_IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+# src="/static/..." / href="/static/..." references in served HTML pages
+_STATIC_REF = re.compile(r'(src|href)="/static/([^"?#]+)"')
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/javascript",
+    "text/css",
+    "text/html",
+    "text/javascript",
+    "text/plain",
+}
+
+
+# ---------------------------------------------------------------------------
+# JSON provider
+# ---------------------------------------------------------------------------
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson.
+
+    Anything orjson can't serialize natively is passed through Flask's
+    default hook, so behavior matches the stdlib provider.
+    """
+
+    # Sorting keys costs CPU on large team plans and clients don't rely on it
+    sort_keys = False
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode("utf-8")
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+
+def init_json_provider(app: Flask) -> None:
+    """
+    Install the fastest available JSON provider on the app.
+
+    JSON_PROVIDER=stdlib forces Flask's default provider; otherwise orjson
+    is used whenever it is installed.
+    """
+    choice = os.getenv("JSON_PROVIDER", "orjson").lower()
+    if choice == "orjson" and orjson is not None:
+        app.json_provider_class = OrjsonProvider
+        app.json = OrjsonProvider(app)
+
+
+# ---------------------------------------------------------------------------
+# Response compression
+# ---------------------------------------------------------------------------
+
+def _choose_encoding() -> str | None:
+    """Pick br or gzip based on the request's Accept-Encoding header."""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress_response(response: Response) -> Response:
+    """
+    after_request hook: compress eligible responses with br or gzip.
+
+    Streamed responses (e.g. bulk import progress) and file passthroughs
+    are left alone so we never buffer them.
+    """
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code >= 300
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+
+    encoding = _choose_encoding()
+    if encoding is None:
+        return response
+
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE:
+        return response
+
+    if encoding == "br":
+        compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+# ---------------------------------------------------------------------------
+# Static asset caching
+# ---------------------------------------------------------------------------
+
+def add_static_cache_headers(response: Response) -> Response:
+    """
+    after_request hook: cache headers for files under /static/.
+
+    Flask already sends an ETag for static files, so unversioned URLs are
+    revalidated cheaply (304). URLs carrying a ?v=<version> query are
+    cached as immutable for a year.
+    """
+    if not request.path.startswith("/static/") or response.status_code not in (200, 304):
+        return response
+
+    if request.args.get("v"):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = STATIC_IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.public = True
+        response.cache_control.no_cache = True
+    return response
+
+
+_asset_versions: Dict[str, Tuple[float, str]] = {}
+_asset_versions_lock = threading.Lock()
+
+
+def asset_version(static_folder: str, filename: str) -> str | None:
+    """
+    Short content hash of a static file, used as its ?v= version.
+
+    Hashes are cached per file and recomputed when its mtime changes.
+    Returns None if the file doesn't exist.
+    """
+    path = safe_join(static_folder, filename)
+    if path is None:
+        return None
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _asset_versions_lock:
+        cached = _asset_versions.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(path, "rb") as f:
+        version = hashlib.sha256(f.read()).hexdigest()[:12]
+    with _asset_versions_lock:
+        _asset_versions[path] = (mtime, version)
+    return version
+
+
+def send_versioned_html(app: Flask, filename: str) -> Response:
+    """
+    Serve an HTML page from the static folder with every /static/ asset
+    URL rewritten to carry ?v=<content hash>.
+
+    The assets are then cached as immutable (see add_static_cache_headers)
+    and a changed asset gets a new URL. The page itself is revalidated
+    on every load via its ETag.
+    """
+    with open(safe_join(app.static_folder, filename), "r", encoding="utf-8") as f:
+        html = f.read()
+
+    def versioned(match: "re.Match[str]") -> str:
+        attr, asset = match.group(1), match.group(2)
+        version = asset_version(app.static_folder, asset)
+        if version is None:
+            return match.group(0)
+        return f'{attr}="/static/{asset}?v={version}"'
+
+    response = Response(_STATIC_REF.sub(versioned, html), mimetype="text/html")
+    response.cache_control.no_cache = True
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+def init_http(app: Flask) -> None:
+    """
+    Wire up JSON provider, compression and static caching on the app.
+
+    RESPONSE_COMPRESSION=0 disables compression (e.g. behind a proxy that
+    already compresses).
+    """
+    init_json_provider(app)
+    app.after_request(add_static_cache_headers)
+    if os.getenv("RESPONSE_COMPRESSION", "1") != "0":
+        app.after_request(compress_response)
+
@@ -0,0 +1,440 @@
+# import_service.py
+import csv
+import io
+import json
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+
+from helix_service import clear_analytics_cache, init_helix_client, unwrap_result
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_CONCURRENCY = 4
+MAX_BATCH_SIZE = 5000
+MAX_CONCURRENCY = 32
+
+# How often (in rows read) we emit a progress event
+PROGRESS_EVERY = 1000
+
+# Row type -> Helix query used to write it
+ROW_QUERIES = {
+    "person": "createPerson",
+    "team": "createTeam",
+    "member": "addTeamMemberByName",
+    "manager": "addTeamManagerByName",
+}
+
+# Node rows must be written before any membership row that references them
+NODE_TYPES = {"person", "team"}
+
+# Node type -> (lookup query, its name argument)
+NAME_LOOKUPS = {
+    "person": ("getPersonByName", "person_name"),
+    "team": ("getTeamByName", "team_name"),
+}
+
+# How many person/team name lookups one import keeps cached
+NAME_CACHE_SIZE = 10000
+
+CSV_TAG_SEPARATORS = (";", "|")
+
+
+# ---------------------------------------------------------------------------
+# Parsing (streaming, one row at a time)
+# ---------------------------------------------------------------------------
+
+def iter_ndjson(stream: TextIO) -> Iterator[Tuple[int, Any]]:
+    """
+    Yield (line_no, parsed_object) for each non-blank NDJSON line.
+
+    Lines that fail to parse are yielded as a ValueError in place of the
+    object so the caller can report them as per-row errors.
+    """
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError as e:
+            yield line_no, ValueError(f"invalid JSON: {e}")
+
+
+def iter_csv(stream: TextIO) -> Iterator[Tuple[int, Any]]:
+    """
+    Yield (line_no, row_dict) for each CSV row.
+
+    Expected header: type,name,tags,text,person_name,team_name,role
+    (columns that don't apply to a row type may be left empty).
+    Tags are a single cell separated by ';' or '|'.
+    """
+    reader = csv.DictReader(stream)
+    for row in reader:
+        cleaned = {k.strip(): (v or "").strip() for k, v in row.items() if k}
+        tags = cleaned.get("tags", "")
+        for sep in CSV_TAG_SEPARATORS:
+            if sep in tags:
+                cleaned["tags"] = [t.strip() for t in tags.split(sep) if t.strip()]
+                break
+        else:
+            cleaned["tags"] = [tags] if tags else []
+        yield reader.line_num, cleaned
+
+
+def detect_format(content_type: Optional[str], filename: Optional[str] = None) -> str:
+    """Guess 'csv' or 'ndjson' from a content type or filename."""
+    ct = (content_type or "").lower()
+    name = (filename or "").lower()
+    if "csv" in ct or name.endswith(".csv"):
+        return "csv"
+    return "ndjson"
+
+
+# ---------------------------------------------------------------------------
+# Validation
+# ---------------------------------------------------------------------------
+
+def validate_row(raw: Any) -> Tuple[str, Dict[str, Any]]:
+    """
+    Turn a raw parsed row into (row_type, query_args).
+
+    Accepted row shapes:
+      {"type": "person", "name": "...", "tags": [...], "text": "..."}
+      {"type": "team", "name": "...", "text": "..."}
+      {"type": "membership", "person_name": "...", "team_name": "...",
+       "role": "member" | "manager"}
+
+    Raises ValueError with a human-readable message if the row is invalid.
+    """
+    if isinstance(raw, Exception):
+        raise ValueError(str(raw))
+    if not isinstance(raw, dict):
+        raise ValueError("row must be a JSON object")
+
+    row_type = str(raw.get("type") or "").strip().lower()
+
+    if row_type == "person":
+        name = raw.get("name")
+        if not name:
+            raise ValueError("person row requires name")
+        tags = raw.get("tags") or []
+        if not isinstance(tags, list) or not all(isinstance(t, str) for t in tags):
+            raise ValueError("person tags must be a list of strings")
+        return "person", {"name": str(name), "tags": tags, "text": str(raw.get("text") or "")}
+
+    if row_type == "team":
+        name = raw.get("name")
+        if not name:
+            raise ValueError("team row requires name")
+        return "team", {"name": str(name), "text": str(raw.get("text") or "")}
+
+    if row_type in ("membership", "member", "manager"):
+        person_name = raw.get("person_name")
+        team_name = raw.get("team_name")
+        if not person_name or not team_name:
+            raise ValueError("membership row requires person_name and team_name")
+        role = str(raw.get("role") or ("manager" if row_type == "manager" else "member")).lower()
+        if role not in ("member", "manager"):
+            raise ValueError("membership role must be 'member' or 'manager'")
+        return role, {"person_name": str(person_name), "team_name": str(team_name)}
+
+    raise ValueError(f"unknown row type: {raw.get('type')!r}")
+
+
+# ---------------------------------------------------------------------------
+# Batch writing
+# ---------------------------------------------------------------------------
+
+Batch = List[Tuple[int, Dict[str, Any]]]
+
+
+class NameLookups:
+    """
+    How many Person / Team nodes carry a given name, cached for one import.
+
+    Shared by every batch of the run (batches write from worker threads),
+    bounded to NAME_CACHE_SIZE names with least-recently-used eviction.
+    Node writes claim their name here, so later rows of the same import
+    see it without another round trip.
+    """
+
+    def __init__(self, max_entries: int = NAME_CACHE_SIZE):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._counts: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+
+    def _store(self, key: Tuple[str, str], n: int) -> int:
+        # Caller holds the lock; a value another thread stored first wins
+        if key in self._counts:
+            self._counts.move_to_end(key)
+            return self._counts[key]
+        if len(self._counts) >= self._max_entries:
+            self._counts.popitem(last=False)
+        self._counts[key] = n
+        return n
+
+    def count(self, kind: str, name: str) -> int:
+        """Number of `kind` ("person" / "team") nodes named `name`."""
+        key = (kind, name)
+        with self._lock:
+            if key in self._counts:
+                self._counts.move_to_end(key)
+                return self._counts[key]
+        query_name, arg = NAME_LOOKUPS[kind]
+        n = len(unwrap_result(init_helix_client().query(query_name, {arg: name}), kind))
+        with self._lock:
+            return self._store(key, n)
+
+    def claim(self, kind: str, name: str) -> int:
+        """
+        Reserve a name we are about to create. Returns how many nodes
+        already had it; on 0 the name is recorded as taken, so concurrent
+        and later rows with the same name get a non-zero count.
+        """
+        n = self.count(kind, name)
+        with self._lock:
+            n = self._store((kind, name), n)
+            if n == 0:
+                self._counts[(kind, name)] = 1
+            return n
+
+    def release(self, kind: str, name: str) -> None:
+        """Forget a claimed name whose write failed."""
+        with self._lock:
+            self._counts.pop((kind, name), None)
+
+
+def _check_membership(lookups: NameLookups, args: Dict[str, Any]) -> str | None:
+    """
+    Return an error message unless exactly one Person and one Team match.
+
+    The *ByName edge queries would otherwise silently do nothing for a
+    missing name, or add an edge to every node sharing a duplicate name.
+    """
+    for kind, name in (("person", args["person_name"]), ("team", args["team_name"])):
+        n = lookups.count(kind, name)
+        if n == 0:
+            return f"no {kind} named {name!r}"
+        if n > 1:
+            return f"{n} {kind}s named {name!r}; membership is ambiguous"
+    return None
+
+
+def _write_batch(row_type: str, batch: Batch, lookups: NameLookups) -> List[Dict[str, Any]]:
+    """
+    Write one batch of same-typed rows to Helix. Returns a list of error
+    and skipped events.
+
+    Rows are written one query each (helix-py sends list payloads item by
+    item anyway). The writes are not idempotent (AddN / AddE), so a failed
+    row is reported and never retried, and rows that succeeded are never
+    re-sent.
+
+    Person and team rows whose name already exists (in the graph or
+    earlier in this import) are skipped rather than duplicated. Membership
+    rows are first checked to name exactly one existing Person and Team.
+    """
+    db = init_helix_client()
+    query_name = ROW_QUERIES[row_type]
+    events: List[Dict[str, Any]] = []
+
+    for line_no, args in batch:
+        claimed = False
+        try:
+            if row_type in NODE_TYPES:
+                if lookups.claim(row_type, args["name"]):
+                    events.append(
+                        {
+                            "event": "skipped",
+                            "line": line_no,
+                            "reason": f"{row_type} named {args['name']!r} already exists",
+                        }
+                    )
+                    continue
+                claimed = True
+            else:
+                problem = _check_membership(lookups, args)
+                if problem:
+                    events.append({"event": "error", "line": line_no, "error": problem})
+                    continue
+            db.query(query_name, args)
+        except Exception as e:
+            if claimed:
+                lookups.release(row_type, args["name"])
+            events.append({"event": "error", "line": line_no, "error": f"Helix query failed: {e}"})
+    return events
+
+
+def import_rows(
+    rows: Iterable[Tuple[int, Any]],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Validate and write a stream of (line_no, raw_row) pairs to Helix.
+
+    Rows are grouped into per-type batches of `batch_size` and written by at
+    most `concurrency` worker threads. At most `concurrency` batches are in
+    flight, so memory stays bounded no matter how long the input is.
+
+    Membership rows are only submitted once every node batch submitted before
+    them has finished, so edges never race the nodes they connect.
+
+    Person and team names that already exist are skipped, so re-running an
+    import doesn't duplicate nodes. Name lookups are cached for the whole
+    run (see NameLookups).
+
+    Yields event dicts:
+      {"event": "error", "line": n, "error": "..."}
+      {"event": "error", "line": None, "rows": n, "error": "batch failed: ..."}
+      {"event": "skipped", "line": n, "reason": "..."}
+      {"event": "progress", "rows_read": ..., "rows_written": ..., "skipped": ..., "errors": ...}
+      {"event": "done", "rows_read": ..., "rows_written": ..., "skipped": ..., "errors": ...}
+
+    "errors" counts failed rows, so rows_written + skipped + errors == rows_read.
+    """
+    batch_size = max(1, min(int(batch_size), MAX_BATCH_SIZE))
+    concurrency = max(1, min(int(concurrency), MAX_CONCURRENCY))
+
+    buffers: Dict[str, Batch] = {t: [] for t in ROW_QUERIES}
+    in_flight: Dict[Future, Tuple[str, int]] = {}
+    node_futures: Set[Future] = set()
+    stats = {"rows_read": 0, "rows_written": 0, "skipped": 0, "errors": 0}
+    lookups = NameLookups()
+
+    def progress(event: str = "progress") -> Dict[str, Any]:
+        return {"event": event, **stats}
+
+    def collect(done: Iterable[Future]) -> Iterator[Dict[str, Any]]:
+        for fut in done:
+            row_type, size = in_flight.pop(fut)
+            node_futures.discard(fut)
+            try:
+                events = fut.result()
+            except Exception as e:
+                # We can't tell which rows made it, so count the whole batch as failed
+                events = [
+                    {"event": "error", "line": None, "rows": size, "error": f"batch failed: {e}"}
+                ]
+            skipped = sum(1 for ev in events if ev["event"] == "skipped")
+            failed = sum(ev.get("rows", 1) for ev in events if ev["event"] == "error")
+            stats["rows_written"] += size - skipped - failed
+            stats["skipped"] += skipped
+            stats["errors"] += failed
+            yield from events
+
+    def drain(futures: Set[Future]) -> Iterator[Dict[str, Any]]:
+        if futures:
+            done, _ = wait(set(futures))
+            yield from collect(done)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+
+        def submit(row_type: str) -> Iterator[Dict[str, Any]]:
+            batch = buffers[row_type]
+            if not batch:
+                return
+            buffers[row_type] = []
+
+            if row_type not in NODE_TYPES:
+                # Flush pending node rows and wait for them before any edges
+                for node_type in NODE_TYPES:
+                    if buffers[node_type]:
+                        yield from submit(node_type)
+                yield from drain(node_futures)
+
+            while len(in_flight) >= concurrency:
+                done, _ = wait(set(in_flight), return_when=FIRST_COMPLETED)
+                yield from collect(done)
+
+            fut = pool.submit(_write_batch, row_type, batch, lookups)
+            in_flight[fut] = (row_type, len(batch))
+            if row_type in NODE_TYPES:
+                node_futures.add(fut)
+
+        for line_no, raw in rows:
+            stats["rows_read"] += 1
+            try:
+                row_type, args = validate_row(raw)
+            except ValueError as e:
+                stats["errors"] += 1
+                yield {"event": "error", "line": line_no, "error": str(e)}
+            else:
+                buffers[row_type].append((line_no, args))
+                if len(buffers[row_type]) >= batch_size:
+                    yield from submit(row_type)
+
+            if stats["rows_read"] % PROGRESS_EVERY == 0:
+                yield progress()
+
+        for row_type in ROW_QUERIES:
+            yield from submit(row_type)
+        yield from drain(set(in_flight))
+
+    if stats["rows_written"]:
+        clear_analytics_cache()
+    yield progress("done")
+
+
+def import_stream(
+    stream: TextIO,
+    fmt: str = "ndjson",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> Iterator[Dict[str, Any]]:
+    """Parse a text stream as NDJSON or CSV and import it (see import_rows)."""
+    rows = iter_csv(stream) if fmt == "csv" else iter_ndjson(stream)
+    return import_rows(rows, batch_size=batch_size, concurrency=concurrency)
+
+
+def import_binary_stream(
+    stream: Any,
+    fmt: str = "ndjson",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> Iterator[Dict[str, Any]]:
+    """Same as import_stream, but for a raw byte stream (e.g. a request body)."""
+    text = io.TextIOWrapper(stream, encoding="utf-8", errors="replace", newline="")
+    return import_stream(text, fmt=fmt, batch_size=batch_size, concurrency=concurrency)
+
+
+if __name__ == "__main__":
+    """
+    CLI bulk import straight into Helix:
+
+        python import_service.py people.ndjson
+        python import_service.py org.csv --batch-size 1000 --concurrency 8
+        cat org.ndjson | python import_service.py -
+
+    Prints one JSON event per line (progress + per-row errors).
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Bulk import people, teams and memberships into Helix.")
+    parser.add_argument("path", help="NDJSON or CSV file, or '-' for stdin")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default=None)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    cli_args = parser.parse_args()
+
+    fmt = cli_args.format or detect_format(None, cli_args.path)
+    if cli_args.path == "-":
+        source: TextIO = sys.stdin
+    else:
+        source = open(cli_args.path, "r", encoding="utf-8", newline="")
+
+    exit_code = 0
+    try:
+        for event in import_stream(
+            source, fmt=fmt, batch_size=cli_args.batch_size, concurrency=cli_args.concurrency
+        ):
+            print(json.dumps(event), flush=True)
+            if event["event"] == "done" and event["errors"]:
+                exit_code = 1
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+    raise SystemExit(exit_code)
@@ -0,0 +1,178 @@
+# profile_service.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+# SQLite lookups are chunked to stay under the bound-parameter limit
+_LOOKUP_CHUNK = 500
+
+_store: "ProfileStore | None" = None
+_store_lock = threading.Lock()
+
+
+def normalize_profile_url(url: str) -> str:
+    """
+    Canonical form of a LinkedIn profile URL, used as the store key.
+
+    Drops query string, fragment and trailing slash, lower-cases the path,
+    and maps linkedin.com / m.linkedin.com / country subdomains to
+    www.linkedin.com, so the same profile always hits the same row.
+    """
+    url = url.strip()
+    if "://" not in url:
+        url = "https://" + url
+    parts = urlsplit(url)
+    host = parts.netloc.lower()
+    if host == "linkedin.com" or host.endswith(".linkedin.com"):
+        host = "www.linkedin.com"
+    path = parts.path.rstrip("/").lower()
+    return urlunsplit(("https", host, path, "", ""))
+
+
+def content_hash(profile: Dict[str, Any]) -> str:
+    """Stable hash of a scraped profile's content (ignores bookkeeping keys)."""
+    content = {k: v for k, v in profile.items() if k not in ("url", "scraped_at", "from_cache")}
+    blob = json.dumps(content, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ProfileStore:
+    """
+    Persistent store of scraped LinkedIn profiles, backed by SQLite.
+
+    Rows are keyed by normalized profile URL plus whether the scrape was
+    authenticated, and carry the scrape time and a content hash. Reads take
+    a max_age so callers decide how fresh a cached profile has to be.
+
+    An unauthenticated scrape only sees a limited public profile, so it is
+    never served to a caller that asks for authenticated data; an
+    authenticated scrape can serve anyone.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS scraped_profiles (
+                url TEXT NOT NULL,
+                authenticated INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                scraped_at REAL NOT NULL,
+                PRIMARY KEY (url, authenticated)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(
+        self, url: str, max_age: float | None = None, authenticated: bool = False
+    ) -> Dict[str, Any] | None:
+        """Return the stored profile if it is at most max_age seconds old."""
+        hits, _ = self.get_many([url], max_age=max_age, authenticated=authenticated)
+        return hits.get(url)
+
+    def get_many(
+        self,
+        urls: Iterable[str],
+        max_age: float | None = None,
+        authenticated: bool = False,
+    ) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """
+        Split urls into fresh cache hits and urls that need scraping.
+
+        Returns (hits, stale): hits maps each original url to its stored
+        profile, stale lists the urls that are missing or older than
+        max_age (max_age=None accepts any age). With authenticated=True,
+        only authenticated scrapes count as hits.
+        """
+        by_key: Dict[str, List[str]] = {}
+        for url in urls:
+            by_key.setdefault(normalize_profile_url(url), []).append(url)
+
+        keys = list(by_key)
+        rows: Dict[str, Tuple[str, float]] = {}
+        with self._lock:
+            for i in range(0, len(keys), _LOOKUP_CHUNK):
+                chunk = keys[i:i + _LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                query = (
+                    "SELECT url, data, scraped_at FROM scraped_profiles "
+                    f"WHERE url IN ({placeholders})"
+                )
+                if authenticated:
+                    query += " AND authenticated = 1"
+                for key, data, scraped_at in self._conn.execute(query, chunk):
+                    # Keep the freshest row when both auth levels are stored
+                    if key not in rows or scraped_at > rows[key][1]:
+                        rows[key] = (data, scraped_at)
+
+        now = time.time()
+        hits: Dict[str, Dict[str, Any]] = {}
+        stale: List[str] = []
+        for key, originals in by_key.items():
+            row = rows.get(key)
+            if row is None or (max_age is not None and now - row[1] > max_age):
+                stale.extend(originals)
+                continue
+            profile = json.loads(row[0])
+            profile["scraped_at"] = row[1]
+            profile["from_cache"] = True
+            for url in originals:
+                hits[url] = profile
+        return hits, stale
+
+    def put(self, url: str, profile: Dict[str, Any], scraped_at: float | None = None) -> bool:
+        """
+        Save a freshly scraped profile. Returns True if its content changed
+        since the last stored scrape (or it is new).
+        """
+        key = normalize_profile_url(url)
+        authenticated = int(bool(profile.get("authenticated")))
+        digest = content_hash(profile)
+        data = json.dumps({k: v for k, v in profile.items() if k not in ("scraped_at", "from_cache")})
+        scraped_at = time.time() if scraped_at is None else scraped_at
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash FROM scraped_profiles WHERE url = ? AND authenticated = ?",
+                (key, authenticated),
+            ).fetchone()
+            self._conn.execute(
+                """
+                INSERT INTO scraped_profiles (url, authenticated, data, content_hash, scraped_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(url, authenticated) DO UPDATE SET
+                    data = excluded.data,
+                    content_hash = excluded.content_hash,
+                    scraped_at = excluded.scraped_at
+                """,
+                (key, authenticated, data, digest, scraped_at),
+            )
+            self._conn.commit()
+        return row is None or row[0] != digest
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def get_profile_store() -> ProfileStore:
+    """
+    Shared ProfileStore instance.
+
+    The database lives at PROFILE_STORE_PATH (default ./profiles.db).
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ProfileStore(os.getenv("PROFILE_STORE_PATH", "profiles.db"))
+        return _store
@@ -1,7 +1,7 @@
 from __future__ import annotations
-from typing import Dict, Any
-import time
+from typing import Dict, Any, List
 import os
+import time
 
 # -------------------------
 # 🚫 REMOVED the early __main__ block
@@ -15,6 +15,12 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
 
+from deadline_service import sleep_within_deadline, timeout_for
+from profile_service import get_profile_store, normalize_profile_url
+
+# Upper bounds for page loads / element waits; a request deadline shrinks them
+PAGE_LOAD_TIMEOUT = 30
+
 
 def _new_driver(headless: bool = True) -> webdriver.Chrome:
     options = Options()
@@ -30,13 +36,20 @@ def _new_driver(headless: bool = True) -> webdriver.Chrome:
     return webdriver.Chrome(service=service, options=options)
 
 
+def _get(driver: webdriver.Chrome, url: str) -> None:
+    """driver.get, with the page-load timeout shrunk to the remaining budget."""
+    driver.set_page_load_timeout(timeout_for(PAGE_LOAD_TIMEOUT))
+    driver.get(url)
+
+
 def get_page_title(url: str) -> Dict[str, str]:
     """
     Launch a headless browser, open the URL, and return basic info.
     """
+    timeout_for(None)  # fail fast if the request is already out of time
     driver = _new_driver(headless=True)
     try:
-        driver.get(url)
+        _get(driver, url)
         title = driver.title
         return {"url": url, "title": title}
     finally:
@@ -45,7 +58,7 @@ def get_page_title(url: str) -> Dict[str, str]:
 
 def _login_with_cookie(driver: webdriver.Chrome, li_at: str) -> None:
     """Authenticate to LinkedIn using an existing li_at session cookie."""
-    driver.get("https://www.linkedin.com/")
+    _get(driver, "https://www.linkedin.com/")
     driver.add_cookie({
         "name": "li_at",
         "value": li_at,
@@ -54,17 +67,17 @@ def _login_with_cookie(driver: webdriver.Chrome, li_at: str) -> None:
         "secure": True,
         "httpOnly": True,
     })
-    driver.get("https://www.linkedin.com/feed/")
-    WebDriverWait(driver, 10).until(EC.title_contains("LinkedIn"))
+    _get(driver, "https://www.linkedin.com/feed/")
+    WebDriverWait(driver, timeout_for(10)).until(EC.title_contains("LinkedIn"))
 
 
 def _login_with_credentials(driver: webdriver.Chrome, username: str, password: str) -> None:
-    driver.get("https://www.linkedin.com/login")
-    WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.ID, "username")))
+    _get(driver, "https://www.linkedin.com/login")
+    WebDriverWait(driver, timeout_for(15)).until(EC.presence_of_element_located((By.ID, "username")))
     driver.find_element(By.ID, "username").send_keys(username)
     driver.find_element(By.ID, "password").send_keys(password)
     driver.find_element(By.CSS_SELECTOR, "button[type=submit]").click()
-    WebDriverWait(driver, 15).until(EC.any_of(
+    WebDriverWait(driver, timeout_for(15)).until(EC.any_of(
         EC.url_contains("/feed"),
         EC.title_contains("LinkedIn")
     ))
@@ -104,53 +117,138 @@ def _collect_experience(driver: webdriver.Chrome) -> list[Dict[str, Any]]:
     return items
 
 
-def scrape_linkedin_profile(url: str, auth: Dict[str, Any] | None = None, headless: bool = True) -> Dict[str, Any]:
+def _has_auth(auth: Dict[str, Any]) -> bool:
+    """True if `auth` carries usable cookie or credentials for _login."""
+    method = (auth.get("method") or "cookie").lower()
+    if method == "cookie":
+        return bool(auth.get("li_at"))
+    if method == "credentials":
+        return bool(auth.get("username") and auth.get("password"))
+    return False
+
+
+def _login(driver: webdriver.Chrome, auth: Dict[str, Any]) -> bool:
+    """Log in with whatever auth was provided; returns True if we authenticated."""
+    method = (auth.get("method") or "cookie").lower()
+
+    if method == "cookie" and auth.get("li_at"):
+        _login_with_cookie(driver, auth["li_at"])
+    elif method == "credentials" and auth.get("username") and auth.get("password"):
+        _login_with_credentials(driver, auth["username"], auth["password"])
+    else:
+        _get(driver, "https://www.linkedin.com/")
+        return False
+    return True
+
+
+def _scrape_profile_page(driver: webdriver.Chrome, url: str, authenticated: bool) -> Dict[str, Any]:
+    _get(driver, url)
+    WebDriverWait(driver, timeout_for(15)).until(EC.presence_of_element_located((By.TAG_NAME, "h1")))
+    sleep_within_deadline(1.5)
+
+    name = (
+        _text_or_none(driver, By.CSS_SELECTOR, "h1")
+        or _text_or_none(driver, By.CSS_SELECTOR, ".pv-text-details__left-panel h1")
+    )
+    headline = (
+        _text_or_none(driver, By.CSS_SELECTOR, "div.text-body-medium.break-words")
+        or _text_or_none(driver, By.CSS_SELECTOR, "div.text-body-medium")
+    )
+    location = _text_or_none(driver, By.CSS_SELECTOR, "span.text-body-small.t-black--light")
+    about = _text_or_none(driver, By.CSS_SELECTOR, "section[id^=about] div.inline-show-more-text")
+
+    experiences = _collect_experience(driver)
+
+    return {
+        "url": url,
+        "name": name,
+        "headline": headline,
+        "location": location,
+        "about": about,
+        "experiences": experiences,
+        "authenticated": authenticated,
+    }
+
+
+def scrape_linkedin_profile(
+    url: str,
+    auth: Dict[str, Any] | None = None,
+    headless: bool = True,
+    max_age: float | None = None,
+) -> Dict[str, Any]:
     """
     Scrape basic LinkedIn profile data.
+
+    Every scrape is saved to the local profile store. Pass max_age (seconds)
+    to serve a stored copy that is at most that old without opening a
+    browser; max_age=None always scrapes.
+    """
+    result = scrape_linkedin_profiles([url], auth=auth, headless=headless, max_age=max_age)[url]
+    if "error" in result:
+        raise RuntimeError(result["error"])
+    return result
+
+
+def scrape_linkedin_profiles(
+    urls: List[str],
+    auth: Dict[str, Any] | None = None,
+    headless: bool = True,
+    max_age: float | None = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Scrape many LinkedIn profiles, keyed by the url they were requested with.
+
+    With max_age set, the profile store is checked in one bulk lookup and
+    only missing or stale profiles are scraped, all in a single browser
+    session (one login).
+
+    A failure on one url doesn't abort the batch: that url's result is
+    {"url": ..., "error": "..."} and the rest are still returned.
     """
     auth = auth or {}
-    driver = _new_driver(headless=headless)
+    store = get_profile_store()
+
+    if max_age is not None:
+        # Callers with auth must not be served a limited unauthenticated scrape
+        results, to_scrape = store.get_many(urls, max_age=max_age, authenticated=_has_auth(auth))
+    else:
+        results, to_scrape = {}, list(urls)
+
+    if not to_scrape:
+        return results
+
+    driver = None
+    scraped: Dict[str, Dict[str, Any]] = {}  # normalized url -> profile or error
     try:
-        method = (auth.get("method") or "cookie").lower()
-
-        if method == "cookie" and auth.get("li_at"):
-            _login_with_cookie(driver, auth["li_at"])
-        elif method == "credentials" and auth.get("username") and auth.get("password"):
-            _login_with_credentials(driver, auth["username"], auth["password"])
-        else:
-            driver.get("https://www.linkedin.com/")
-
-        driver.get(url)
-        WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.TAG_NAME, "h1")))
-        time.sleep(1.5)
-
-        name = (
-            _text_or_none(driver, By.CSS_SELECTOR, "h1")
-            or _text_or_none(driver, By.CSS_SELECTOR, ".pv-text-details__left-panel h1")
-        )
-        headline = (
-            _text_or_none(driver, By.CSS_SELECTOR, "div.text-body-medium.break-words")
-            or _text_or_none(driver, By.CSS_SELECTOR, "div.text-body-medium")
-        )
-        location = _text_or_none(driver, By.CSS_SELECTOR, "span.text-body-small.t-black--light")
-        about = _text_or_none(driver, By.CSS_SELECTOR, "section[id^=about] div.inline-show-more-text")
-
-        experiences = _collect_experience(driver)
-
-        print(driver.find_element(By.TAG_NAME, "body").text)
-
-        return {
-            "url": url,
-            "name": name,
-            "headline": headline,
-            "location": location,
-            "about": about,
-            "experiences": experiences,
-            "authenticated": method in ("cookie", "credentials") and bool(auth),
-        }
+        timeout_for(None)  # fail fast if the request is already out of time
+        driver = _new_driver(headless=headless)
+        authenticated = _login(driver, auth)
+    except Exception as e:
+        # No browser session, so nothing left can be scraped
+        for url in to_scrape:
+            results[url] = {"url": url, "error": f"Selenium error: {e}"}
+        if driver is not None:
+            driver.quit()
+        return results
+
+    try:
+        for url in to_scrape:
+            key = normalize_profile_url(url)
+            if key not in scraped:
+                try:
+                    profile = _scrape_profile_page(driver, url, authenticated)
+                except Exception as e:
+                    scraped[key] = {"url": url, "error": f"Selenium error: {e}"}
+                else:
+                    scraped_at = time.time()
+                    store.put(url, profile, scraped_at=scraped_at)
+                    scraped[key] = {**profile, "scraped_at": scraped_at, "from_cache": False}
+            results[url] = scraped[key]
     finally:
         driver.quit()
 
+    return results
+
 
 # ----------------------------------------------------------
 # ✅ CORRECT MAIN BLOCK — now at the bottom, works properly